@@ -1,4 +1,5 @@
 # chunking/__init__.py
 from .chunker import chunk_markdown_file
+from .markdown_chunker import Chunk
 
-__all__ = ['chunk_markdown_file']
\ No newline at end of file
+__all__ = ['chunk_markdown_file', 'Chunk']
\ No newline at end of file
@@ -7,7 +7,9 @@ def chunk_markdown_file(
     max_chunk_size: int = 1024,
     overlap_size: int = 200,
     min_chunk_size: int = 100,  # Added minimum chunk size parameter
-    output_format: str = "jsonl"
+    output_format: str = "jsonl",
+    workers: int = 1,
+    deduplicate: bool = True
 ) -> bool:
     """
     Chunk a markdown file using the hybrid semantic chunking approach.
@@ -19,6 +21,8 @@ def chunk_markdown_file(
         overlap_size: Number of tokens to overlap between chunks
         min_chunk_size: Minimum size for a chunk (smaller chunks will be merged)
         output_format: Format to save chunks ('jsonl', 'csv', 'json')
+        workers: Number of processes used to split oversized sections
+        deduplicate: Drop chunks whose content repeats an earlier chunk
         
     Returns:
         bool: True if chunking was successful, False otherwise
@@ -28,9 +32,18 @@ def chunk_markdown_file(
         max_chunk_size=max_chunk_size,
         overlap_size=overlap_size,
         min_chunk_size=int(min_chunk_size),
-        output_format=output_format
+        output_format=output_format,
+        workers=workers,
+        deduplicate=deduplicate
     )
     
+    if output_format == "jsonl":
+        # JSONL is written line by line as chunks are produced, so skip
+        # building the full chunk list in memory first
+        if not chunker.load_markdown() or not chunker.content.strip():
+            return False
+        return chunker.save_chunks(output_file)
+    
     # Process the markdown file
     chunks = chunker.process()
     
@@ -2,8 +2,95 @@ import re
 import json
 import os
 import csv
-from typing import List, Dict, Tuple, Any
+import mmap
+from typing import List, Dict, Tuple, Any, Iterable, Iterator
+from dataclasses import dataclass, replace
 import hashlib
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+try:
+    import orjson
+except ImportError:  # Optional: fall back to the standard json module
+    orjson = None
+
+# Precompiled patterns shared by all chunker instances
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.+)$', re.MULTILINE)
+_PARA_RE = re.compile(r'\n\s*\n')
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+_NON_SPACE_RE = re.compile(r'\S')
+# Display math, inline math and the supported LaTeX environments in one pass.
+# Display math stops at the first '$' so an unclosed '$$' cannot make the
+# engine scan ahead through the rest of the document
+_FORMULA_RE = re.compile(
+    r'\$\$[^$]*\$\$'
+    r'|\$[^$\n]+?\$'
+    r'|\\begin\{(equation|align|eqnarray|gathered|cases)\}[\s\S]*?\\end\{\1\}',
+    re.DOTALL
+)
+# How far before the overlap zone _get_overlap_text looks for a formula start
+_FORMULA_LOOKBACK = 2048
+# Output buffer for save_chunks, so a book's chunks reach disk in a few large writes
+_WRITE_BUFFER_SIZE = 1 << 20
+# Below this many oversized sections, starting worker processes costs more than it saves
+_MIN_PARALLEL_SECTIONS = 4
+
+def _in_formula(pos: int, formula_starts: List[int], formula_ends: List[int]) -> bool:
+    """Check whether pos falls inside one of the sorted, non-overlapping formula spans."""
+    # Only the last formula starting at or before pos can still be open there
+    i = bisect_right(formula_starts, pos) - 1
+    return i >= 0 and formula_ends[i] >= pos
+
+def _iter_paragraphs(text: str, formula_starts: List[int], formula_ends: List[int]) -> Iterator[Tuple[int, int, str]]:
+    """
+    Yield the non-empty paragraphs of text, never breaking inside a formula.
+    
+    Yields:
+        (start, end, paragraph) tuples, where paragraph is the stripped text
+        and start/end are its offsets in text.
+    """
+    last_pos = 0
+    for match in _PARA_RE.finditer(text):
+        split_pos = match.start()
+        if _in_formula(split_pos, formula_starts, formula_ends):
+            continue
+        raw = text[last_pos:split_pos]
+        paragraph = raw.strip()
+        if paragraph:
+            para_start = last_pos + len(raw) - len(raw.lstrip())
+            yield para_start, para_start + len(paragraph), paragraph
+        last_pos = match.end()
+    
+    # The text after the last break is the final paragraph
+    raw = text[last_pos:]
+    paragraph = raw.strip()
+    if paragraph:
+        para_start = last_pos + len(raw) - len(raw.lstrip())
+        yield para_start, para_start + len(paragraph), paragraph
+
+@dataclass(slots=True)
+class Chunk:
+    """A section of the document together with its heading metadata."""
+    content: str
+    heading: str
+    level: int
+    path: str
+    token_count: int
+    start_pos: int = 0  # Document offsets, only meaningful while chunking
+    end_pos: int = 0
+    id: str = ''
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the fields that are written to the output file."""
+        return {
+            'content': self.content,
+            'heading': self.heading,
+            'level': self.level,
+            'path': self.path,
+            'token_count': self.token_count,
+            'id': self.id
+        }
 
 def __init__(
     self, 
@@ -38,7 +125,9 @@ class MarkdownChunker:
         max_chunk_size: int = 1024,
         overlap_size: int = 200,
         min_chunk_size: int = 100,  # Added minimum chunk size parameter
-        output_format: str = "jsonl"
+        output_format: str = "jsonl",
+        workers: int = 1,
+        deduplicate: bool = True
     ):
         """
         Initialize the chunker with settings for processing a markdown file.
@@ -49,20 +138,39 @@ class MarkdownChunker:
             overlap_size: Number of tokens to overlap between chunks
             min_chunk_size: Minimum size for a chunk (smaller chunks will be merged)
             output_format: Format to save chunks ('jsonl', 'csv', 'json')
+            workers: Number of processes used to split oversized sections
+                (1 splits everything in the current process)
+            deduplicate: Drop chunks whose content repeats an earlier chunk
         """
         self.input_file = input_file
         self.max_chunk_size = max_chunk_size
         self.overlap_size = overlap_size
         self.min_chunk_size = int(min_chunk_size)
         self.output_format = output_format
+        self.workers = workers
+        self.deduplicate = deduplicate
         self.content = ""
         self.chunks = []
         
     def load_markdown(self) -> bool:
         """Load the markdown content from file."""
         try:
-            with open(self.input_file, 'r', encoding='utf-8') as file:
-                self.content = file.read()
+            with open(self.input_file, 'rb') as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    self.content = ""
+                    return True
+                # Decode straight from a read-only mapping of the file so the raw
+                # bytes are never copied into a private buffer next to the text
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    # The file is decoded front to back, so ask for aggressive
+                    # readahead where the platform supports it (not on Windows)
+                    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                        mapped.madvise(mmap.MADV_SEQUENTIAL)
+                    content = str(mapped, 'utf-8')
+            # Match text-mode reading, which normalises line endings
+            if '\r' in content:
+                content = content.replace('\r\n', '\n').replace('\r', '\n')
+            self.content = content
             return True
         except Exception as e:
             print(f"Error loading markdown file: {e}")
@@ -70,41 +178,17 @@ class MarkdownChunker:
     
     def is_formula(self, text: str) -> bool:
         """Check if text contains LaTeX formula."""
-        # Enhanced formula detection patterns
-        formula_patterns = [
-            r'\$\$[\s\S]*?\$\$',                         # Display math: $$...$$
-            r'\$[^$\n]+?\$',                             # Inline math: $...$
-            r'\\begin\{equation\}[\s\S]*?\\end\{equation\}',  # equation environment
-            r'\\begin\{align\}[\s\S]*?\\end\{align\}',        # align environment
-            r'\\begin\{eqnarray\}[\s\S]*?\\end\{eqnarray\}',  # eqnarray environment
-            r'\\begin\{gathered\}[\s\S]*?\\end\{gathered\}',  # gathered environment
-            r'\\begin\{cases\}[\s\S]*?\\end\{cases\}'         # cases environment
-        ]
-        
-        for pattern in formula_patterns:
-            if re.search(pattern, text, re.DOTALL):
-                return True
-        return False
+        # Every formula starts with '$' or '\begin'; plain prose skips the regex
+        if '$' not in text and '\\begin' not in text:
+            return False
+        return _FORMULA_RE.search(text) is not None
     
     def extract_formula_boundaries(self, text: str) -> List[Tuple[int, int]]:
         """Extract the start and end positions of all formulas in text."""
-        formula_patterns = [
-            (r'\$\$([\s\S]*?)\$\$', 0),                             # Display math
-            (r'\$([^$\n]+?)\$', 0),                                 # Inline math
-            (r'\\begin\{equation\}([\s\S]*?)\\end\{equation\}', 0), # equation
-            (r'\\begin\{align\}([\s\S]*?)\\end\{align\}', 0),       # align
-            (r'\\begin\{eqnarray\}([\s\S]*?)\\end\{eqnarray\}', 0), # eqnarray
-            (r'\\begin\{gathered\}([\s\S]*?)\\end\{gathered\}', 0), # gathered
-            (r'\\begin\{cases\}([\s\S]*?)\\end\{cases\}', 0)        # cases
-        ]
-        
-        boundaries = []
-        for pattern, group_idx in formula_patterns:
-            for match in re.finditer(pattern, text, re.DOTALL):
-                boundaries.append((match.start(), match.end()))
-        
-        # Sort by start position
-        return sorted(boundaries)
+        if '$' not in text and '\\begin' not in text:
+            return []
+        # A single left-to-right pass yields non-overlapping spans already in order
+        return [(match.start(), match.end()) for match in _FORMULA_RE.finditer(text)]
     
     def estimate_tokens(self, text: str) -> int:
         """Estimate the number of tokens in text."""
@@ -113,294 +197,364 @@ class MarkdownChunker:
         # from your actual embedding model
         return max(1, len(text) // 4)  # Ensure at least 1 token
     
-    def extract_heading_structure(self) -> List[Dict[str, Any]]:
-        """Extract the heading structure from markdown."""
-        # Pattern to match headings in markdown
-        heading_pattern = re.compile(r'^(#{1,6})\s+(.+)$', re.MULTILINE)
-        
-        # Find all headings with their positions
-        headings = []
-        for match in heading_pattern.finditer(self.content):
-            level = len(match.group(1))  # Number of # characters
-            title = match.group(2).strip()
+    def tokenize_batch(self, texts: List[str]) -> List[int]:
+        """
+        Estimate the number of tokens for each text in a batch.
+        
+        Override this together with estimate_tokens to plug in a real
+        tokenizer; batch encoders such as tiktoken's encode_ordinary_batch
+        are much faster than encoding one paragraph at a time.
+        """
+        return [self.estimate_tokens(text) for text in texts]
+    
+    def _counts_by_characters(self) -> bool:
+        """Whether token counts are the default estimate derived from character counts."""
+        chunker_class = type(self)
+        return (chunker_class.estimate_tokens is MarkdownChunker.estimate_tokens
+                and chunker_class.tokenize_batch is MarkdownChunker.tokenize_batch)
+    
+    def extract_heading_structure(self) -> Iterator[Tuple[str, int, str, int, int]]:
+        """
+        Walk the markdown headings in a single pass, one section per heading.
+        
+        Yields:
+            (heading, level, path, start, end) tuples, where path is the
+            breadcrumb of enclosing headings and start/end are offsets into
+            the content. Text before the first heading is yielded as a level 0
+            "Document Start" section.
+        """
+        # Levels and paths of the headings enclosing the current one, kept as
+        # parallel stacks; each path already includes its ancestors
+        level_stack = []
+        path_stack = []
+        heading, level, path, start = "Document Start", 0, "Root", 0
+        
+        for match in _HEADING_RE.finditer(self.content):
             position = match.start()
-            headings.append({
-                'level': level,
-                'title': title,
-                'position': position
-            })
-        
-        # Add document start as the initial position if no headings at start
-        if not headings or headings[0]['position'] > 0:
-            headings.insert(0, {
-                'level': 0,
-                'title': 'Document Start',
-                'position': 0
-            })
-        
-        # Add document end as the final position
-        headings.append({
-            'level': 0,
-            'title': 'END',
-            'position': len(self.content)
-        })
-        
-        return headings
+            yield heading, level, path, start, position
+            
+            hashes, title = match.groups()
+            level = len(hashes)  # Number of # characters
+            heading = title.strip()
+            start = position
+            
+            # Drop siblings and deeper headings, then descend into this one
+            while level_stack and level_stack[-1] >= level:
+                level_stack.pop()
+                path_stack.pop()
+            path = path_stack[-1] + " > " + heading if path_stack else heading
+            level_stack.append(level)
+            path_stack.append(path)
+        
+        yield heading, level, path, start, len(self.content)
     
-    def create_semantic_chunks(self) -> List[Dict[str, Any]]:
+    def create_semantic_chunks(self) -> List[Chunk]:
         """Create chunks based on heading structure with size constraints."""
+        return list(self.iter_chunks())
+    
+    def iter_chunks(self) -> Iterator[Chunk]:
+        """Yield finished chunks one at a time, in document order."""
         if not self.content:
             if not self.load_markdown():
-                return []
-        
-        # Extract heading structure
-        headings = self.extract_heading_structure()
-        
-        # Generate initial chunks based on headings
-        initial_chunks = []
+                return
         
-        for i in range(len(headings) - 1):
-            current = headings[i]
-            next_heading = headings[i + 1]
-            
-            # Extract content between current heading and next heading
-            start_pos = current['position']
-            end_pos = next_heading['position']
-            chunk_content = self.content[start_pos:end_pos]
-            
-            # Skip empty chunks
-            if not chunk_content.strip():
-                continue
-                
-            # Build heading path (breadcrumb)
-            path = []
-            for h in headings[:i+1]:
-                if h['level'] > 0:  # Skip non-heading markers
-                    path.append(h['title'])
-            
-            # Create chunk
-            chunk = {
-                'content': chunk_content,
-                'heading': current['title'] if current['level'] > 0 else "Document Start",
-                'level': current['level'],
-                'path': " > ".join(path) if path else "Root",
-                'token_count': self.estimate_tokens(chunk_content),
-                'start_pos': start_pos,
-                'end_pos': end_pos
-            }
-            
-            initial_chunks.append(chunk)
+        # Sections are sliced out lazily as the splitter consumes them rather
+        # than being collected into a list of initial chunks first
+        sections = self._iter_sections()
         
         # Further process chunks that exceed max size
-        large_chunks_processed = []
-        for chunk in initial_chunks:
-            if chunk['token_count'] <= self.max_chunk_size:
-                large_chunks_processed.append(chunk)
-            else:
-                # Split large chunks with overlap
-                sub_chunks = self._split_large_chunk(chunk)
-                large_chunks_processed.extend(sub_chunks)
+        if self.workers > 1:
+            large_chunks_processed = self._split_large_chunks_parallel(list(sections))
+        else:
+            # Serially, sections flow through splitting and merging one at a
+            # time without collecting an intermediate list
+            large_chunks_processed = self._iter_split_chunks(sections)
         
         # Post-process: merge small chunks together when possible
         final_chunks = self._merge_small_chunks(large_chunks_processed)
         
-        # Add chunk IDs and clean up temporary fields
+        # Add chunk IDs, skipping repeated boilerplate (ids are content hashes)
+        seen_ids = set()
         for chunk in final_chunks:
-            chunk['id'] = self._generate_chunk_id(chunk['content'])
-            # Remove temporary fields used for processing
-            if 'start_pos' in chunk:
-                del chunk['start_pos']
-            if 'end_pos' in chunk:
-                del chunk['end_pos']
+            chunk.id = self._generate_chunk_id(chunk.content)
+            if self.deduplicate:
+                if chunk.id in seen_ids:
+                    continue
+                seen_ids.add(chunk.id)
+            yield chunk
+    
+    def _iter_sections(self) -> Iterator[Chunk]:
+        """Yield an initial chunk for every non-empty section between headings."""
+        for heading, level, path, start_pos, end_pos in self.extract_heading_structure():
+            # Skip empty chunks without copying them out of the content
+            if not _NON_SPACE_RE.search(self.content, start_pos, end_pos):
+                continue
             
-        return final_chunks
+            # Extract content between current heading and next heading
+            chunk_content = self.content[start_pos:end_pos]
+            yield Chunk(
+                content=chunk_content,
+                heading=heading,
+                level=level,
+                path=path,
+                token_count=self.estimate_tokens(chunk_content),
+                start_pos=start_pos,
+                end_pos=end_pos
+            )
+    
+    def _iter_split_chunks(self, chunks: Iterable[Chunk]) -> Iterator[Chunk]:
+        """Pass chunks through, splitting the ones that exceed max_chunk_size."""
+        for chunk in chunks:
+            if chunk.token_count <= self.max_chunk_size:
+                yield chunk
+            else:
+                # Split large chunks with overlap
+                yield from self._split_large_chunk(chunk)
     
     def _generate_chunk_id(self, content: str) -> str:
         """Generate a unique ID for a chunk based on its content."""
-        return hashlib.md5(content.encode('utf-8')).hexdigest()[:12]
+        return hashlib.blake2b(
+            content.encode('utf-8'), digest_size=6, usedforsecurity=False
+        ).hexdigest()
     
-    def _split_large_chunk(self, chunk: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _split_large_chunks_parallel(self, chunks: List[Chunk]) -> List[Chunk]:
+        """Split oversized chunks in worker processes, keeping document order."""
+        oversized = [chunk for chunk in chunks if chunk.token_count > self.max_chunk_size]
+        
+        if len(oversized) < _MIN_PARALLEL_SECTIONS:
+            return list(self._iter_split_chunks(chunks))
+        
+        processed = []
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(oversized))) as executor:
+            # map() returns results in submission order, so they line up with oversized.
+            # Workers build the same chunker class so tokenizer overrides still apply
+            split_results = executor.map(
+                _split_large_chunk_worker,
+                repeat(type(self)),
+                oversized,
+                repeat(self.max_chunk_size),
+                repeat(self.overlap_size),
+                chunksize=8
+            )
+            for chunk in chunks:
+                if chunk.token_count <= self.max_chunk_size:
+                    processed.append(chunk)
+                else:
+                    processed.extend(next(split_results))
+        
+        return processed
+    
+    def _split_large_chunk(self, chunk: Chunk) -> List[Chunk]:
         """Split large chunks into smaller ones with overlap, respecting formulas."""
-        content = chunk['content']
-        token_count = chunk['token_count']
-        path = chunk['path']
-        heading = chunk['heading']
-        level = chunk['level']
+        content = chunk.content
+        token_count = chunk.token_count
+        path = chunk.path
+        heading = chunk.heading
+        level = chunk.level
         
         # Extract all formula boundaries
         formula_boundaries = self.extract_formula_boundaries(content)
+        formula_starts = [start for start, _ in formula_boundaries]
+        formula_ends = [end for _, end in formula_boundaries]
         
-        # First try to split at paragraph boundaries
-        paragraphs = []
-        last_pos = 0
-        
-        # Split by paragraphs but keep formulas intact
-        para_pattern = re.compile(r'\n\s*\n')
-        for match in para_pattern.finditer(content):
-            para_end = match.start()
-            
-            # Check if we're inside a formula
-            in_formula = False
-            for start, end in formula_boundaries:
-                if start <= para_end <= end:
-                    in_formula = True
-                    break
-            
-            if not in_formula:
-                # Safe to split here
-                paragraph = content[last_pos:para_end].strip()
-                if paragraph:
-                    paragraphs.append(paragraph)
-                last_pos = match.end()
-        
-        # Add the final paragraph
-        final_para = content[last_pos:].strip()
-        if final_para:
-            paragraphs.append(final_para)
+        # First try to split at paragraph boundaries, keeping each paragraph's
+        # (start, end) offsets in the section alongside its stripped text
+        paragraphs = list(_iter_paragraphs(content, formula_starts, formula_ends))
         
         # If no paragraphs were found or only one paragraph, split by sentences or fixed size
         if len(paragraphs) <= 1 and token_count > self.max_chunk_size:
             return self._split_by_sentences(chunk, formula_boundaries)
         
-        # Now process the paragraphs into chunks
+        # Sub-chunks are whole paragraphs of this section, so a section without
+        # formulas cannot produce overlap text that contains one
+        section_has_formulas = bool(formula_boundaries)
+        
+        # Size every paragraph once up front; the loop below only looks them up
+        para_token_counts = self.tokenize_batch([para for _, _, para in paragraphs])
+        
+        # The default estimate is derived from the running character count, which
+        # includes the separators. A custom tokenizer's counts are summed instead,
+        # with the separator counted like any other text
+        counts_by_characters = self._counts_by_characters()
+        separator_token_count = 0 if counts_by_characters else self.tokenize_batch(["\n\n"])[0]
+        
+        # Now process the paragraphs into chunks. Attributes used on every
+        # iteration are bound to locals once
+        max_chunk_size = self.max_chunk_size
         sub_chunks = []
-        current_chunk_text = ""
+        add_sub_chunk = sub_chunks.append
+        current_parts = []  # Paragraphs of the current sub-chunk, joined only on save
+        current_char_count = 0
         current_token_count = 0
-        current_start_pos = chunk['start_pos']
+        current_start_pos = chunk.start_pos
         
-        for para in paragraphs:
-            para_token_count = self.estimate_tokens(para)
-            
+        for (para_start, para_end, para), para_token_count in zip(paragraphs, para_token_counts):
             # If this single paragraph exceeds max size, split it further
-            if para_token_count > self.max_chunk_size:
-                if current_chunk_text:
+            if para_token_count > max_chunk_size:
+                if current_parts:
                     # Save current accumulated chunk
-                    sub_chunk = {
-                        'content': current_chunk_text,
-                        'heading': heading,
-                        'level': level,
-                        'path': path,
-                        'token_count': current_token_count,
-                        'start_pos': current_start_pos,
-                        'end_pos': current_start_pos + len(current_chunk_text)
-                    }
-                    sub_chunks.append(sub_chunk)
-                    current_chunk_text = ""
+                    sub_chunk = Chunk(
+                        content="\n\n".join(current_parts),
+                        heading=heading,
+                        level=level,
+                        path=path,
+                        token_count=current_token_count,
+                        start_pos=current_start_pos,
+                        end_pos=current_start_pos + current_char_count
+                    )
+                    add_sub_chunk(sub_chunk)
+                    current_parts = []
+                    current_char_count = 0
                     current_token_count = 0
                 
                 # Create a temporary chunk for this paragraph and split it
-                para_chunk = {
-                    'content': para,
-                    'heading': heading,
-                    'level': level,
-                    'path': path,
-                    'token_count': para_token_count,
-                    'start_pos': content.find(para, current_start_pos) + chunk['start_pos'],
-                    'end_pos': content.find(para, current_start_pos) + len(para) + chunk['start_pos']
-                }
-                para_sub_chunks = self._split_by_sentences(para_chunk, formula_boundaries)
+                para_chunk = Chunk(
+                    content=para,
+                    heading=heading,
+                    level=level,
+                    path=path,
+                    token_count=para_token_count,
+                    start_pos=chunk.start_pos + para_start,
+                    end_pos=chunk.start_pos + para_end
+                )
+                # Sentence splitting works in paragraph offsets, so hand it only the
+                # formulas overlapping this paragraph, shifted to match
+                para_formula_boundaries = [
+                    (f_start - para_start, f_end - para_start)
+                    for f_start, f_end in formula_boundaries
+                    if f_end >= para_start and f_start <= para_end
+                ]
+                para_sub_chunks = self._split_by_sentences(para_chunk, para_formula_boundaries)
                 sub_chunks.extend(para_sub_chunks)
                 
                 # Update the start position for the next paragraph
-                current_start_pos = para_chunk['end_pos']
+                current_start_pos = para_chunk.end_pos
                 continue
             
-            # If adding this paragraph would exceed max size, save current chunk and start new one
-            if current_token_count + para_token_count > self.max_chunk_size and current_chunk_text:
+            # If adding this paragraph would exceed max size, save current chunk and start new one.
+            # The grown size is measured the same way as current_token_count
+            if current_parts:
+                if counts_by_characters:
+                    grown_token_count = max(1, (current_char_count + 2 + len(para)) // 4)
+                else:
+                    grown_token_count = current_token_count + separator_token_count + para_token_count
+            if current_parts and grown_token_count > max_chunk_size:
                 # Save current chunk
-                sub_chunk = {
-                    'content': current_chunk_text,
-                    'heading': heading,
-                    'level': level,
-                    'path': path,
-                    'token_count': current_token_count,
-                    'start_pos': current_start_pos,
-                    'end_pos': current_start_pos + len(current_chunk_text)
-                }
-                sub_chunks.append(sub_chunk)
+                current_chunk_text = "\n\n".join(current_parts)
+                sub_chunk = Chunk(
+                    content=current_chunk_text,
+                    heading=heading,
+                    level=level,
+                    path=path,
+                    token_count=current_token_count,
+                    start_pos=current_start_pos,
+                    end_pos=current_start_pos + current_char_count
+                )
+                add_sub_chunk(sub_chunk)
                 
                 # Create overlap by including previous text up to overlap_size
-                overlap_text = self._get_overlap_text(current_chunk_text)
-                current_chunk_text = overlap_text
-                current_token_count = self.estimate_tokens(overlap_text)
-                current_start_pos = sub_chunk['end_pos'] - len(overlap_text)
+                overlap_text = self._get_overlap_text(current_chunk_text, section_has_formulas)
+                current_parts = [overlap_text] if overlap_text else []
+                current_char_count = len(overlap_text)
+                current_token_count = self.tokenize_batch([overlap_text])[0] if overlap_text else 0
+                current_start_pos = sub_chunk.end_pos - len(overlap_text)
             
             # Add paragraph to current chunk
-            if current_chunk_text:
-                current_chunk_text += "\n\n" + para
+            if current_parts:
+                current_char_count += 2 + len(para)
+                current_token_count += separator_token_count + para_token_count
             else:
-                current_chunk_text = para
-            current_token_count = self.estimate_tokens(current_chunk_text)
+                current_char_count = len(para)
+                current_token_count = para_token_count
+            current_parts.append(para)
+            if counts_by_characters:
+                # Same as estimate_tokens on the joined text, without re-measuring it
+                current_token_count = max(1, current_char_count // 4)
         
         # Add the last sub-chunk if there's content left
-        if current_chunk_text:
-            sub_chunk = {
-                'content': current_chunk_text,
-                'heading': heading,
-                'level': level,
-                'path': path,
-                'token_count': current_token_count,
-                'start_pos': current_start_pos,
-                'end_pos': current_start_pos + len(current_chunk_text)
-            }
-            sub_chunks.append(sub_chunk)
+        if current_parts:
+            sub_chunk = Chunk(
+                content="\n\n".join(current_parts),
+                heading=heading,
+                level=level,
+                path=path,
+                token_count=current_token_count,
+                start_pos=current_start_pos,
+                end_pos=current_start_pos + current_char_count
+            )
+            add_sub_chunk(sub_chunk)
         
         return sub_chunks
     
-    def _split_by_sentences(self, chunk: Dict[str, Any], formula_boundaries: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
-        """Split chunk by sentences when paragraphs are too large."""
-        content = chunk['content']
-        path = chunk['path']
-        heading = chunk['heading']
-        level = chunk['level']
-        start_pos = chunk['start_pos']
-        
-        # Function to check if position is within a formula
-        def in_formula(pos):
-            rel_pos = start_pos + pos  # Position relative to the document
-            for f_start, f_end in formula_boundaries:
-                if f_start <= rel_pos <= f_end:
-                    return True
-            return False
+    def _split_by_sentences(self, chunk: Chunk, formula_boundaries: List[Tuple[int, int]]) -> List[Chunk]:
+        """
+        Split chunk by sentences when paragraphs are too large.
+        
+        Args:
+            chunk: Chunk to split
+            formula_boundaries: Formula spans as offsets into chunk.content
+        """
+        content = chunk.content
+        path = chunk.path
+        heading = chunk.heading
+        level = chunk.level
+        start_pos = chunk.start_pos
+        
+        # Callers pass spans relative to this chunk's content, the same offsets
+        # the sentence matches below use
+        formula_starts = [start for start, _ in formula_boundaries]
+        formula_ends = [end for _, end in formula_boundaries]
         
-        # Pattern for sentence endings
-        sentence_pattern = re.compile(r'(?<=[.!?])\s+')
+        # Sub-chunks here are rebuilt from this content's sentences, so they can
+        # only hold formula markers if the content itself does; check once
+        may_contain_formulas = '$' in content or '\\begin' in content
         
         sub_chunks = []
-        current_chunk_text = ""
+        current_parts = []  # Sentences of the current sub-chunk, joined only on save
+        current_char_count = 0
         current_token_count = 0
         current_start = 0
         
         # Get sentence boundaries
         sentence_boundaries = []
-        for match in sentence_pattern.finditer(content):
-            if not in_formula(match.start()):
+        for match in _SENTENCE_RE.finditer(content):
+            if not _in_formula(match.start(), formula_starts, formula_ends):
                 sentence_boundaries.append(match.start())
         
         # Add the end of content as final boundary
         sentence_boundaries.append(len(content))
         
-        # Process sentences into chunks
+        # Slice out every sentence with its start offset, then size them all
+        # in one batch like the paragraph path does
+        sentences = []
         last_boundary = 0
         for boundary in sentence_boundaries:
-            sentence = content[last_boundary:boundary].strip()
-            sentence_token_count = self.estimate_tokens(sentence)
-            
+            sentences.append((last_boundary, content[last_boundary:boundary].strip()))
+            last_boundary = boundary
+        sentence_token_counts = self.tokenize_batch([sentence for _, sentence in sentences])
+        
+        # Running sizes follow the same scheme as the paragraph path
+        counts_by_characters = self._counts_by_characters()
+        separator_token_count = 0 if counts_by_characters else self.tokenize_batch([" "])[0]
+        
+        # Process sentences into chunks
+        for (last_boundary, sentence), sentence_token_count in zip(sentences, sentence_token_counts):
             # If a single sentence exceeds max size, split it by a fixed size
             if sentence_token_count > self.max_chunk_size:
-                if current_chunk_text:
+                if current_parts:
                     # Save current chunk
-                    sub_chunk = {
-                        'content': current_chunk_text,
-                        'heading': heading,
-                        'level': level,
-                        'path': path,
-                        'token_count': current_token_count,
-                        'start_pos': start_pos + current_start,
-                        'end_pos': start_pos + current_start + len(current_chunk_text)
-                    }
+                    sub_chunk = Chunk(
+                        content=" ".join(current_parts),
+                        heading=heading,
+                        level=level,
+                        path=path,
+                        token_count=current_token_count,
+                        start_pos=start_pos + current_start,
+                        end_pos=start_pos + current_start + current_char_count
+                    )
                     sub_chunks.append(sub_chunk)
-                    current_chunk_text = ""
+                    current_parts = []
+                    current_char_count = 0
                     current_token_count = 0
                 
                 # Split the sentence by fixed size, respecting token limit
@@ -412,132 +566,171 @@ class MarkdownChunker:
                         overlap_size_chars = min(self.overlap_size * 4, len(chunk_text))
                         chunk_text = sentence[i - overlap_size_chars:i + chars_per_chunk]
                     
-                    sub_chunk = {
-                        'content': chunk_text,
-                        'heading': heading,
-                        'level': level,
-                        'path': path,
-                        'token_count': self.estimate_tokens(chunk_text),
-                        'start_pos': start_pos + last_boundary + i,
-                        'end_pos': start_pos + last_boundary + i + len(chunk_text)
-                    }
+                    sub_chunk = Chunk(
+                        content=chunk_text,
+                        heading=heading,
+                        level=level,
+                        path=path,
+                        token_count=self.estimate_tokens(chunk_text),
+                        start_pos=start_pos + last_boundary + i,
+                        end_pos=start_pos + last_boundary + i + len(chunk_text)
+                    )
                     sub_chunks.append(sub_chunk)
             else:
                 # If adding this sentence would exceed max size, save current chunk and start new one
-                if current_token_count + sentence_token_count > self.max_chunk_size and current_chunk_text:
+                if current_parts:
+                    if counts_by_characters:
+                        grown_token_count = max(1, (current_char_count + 1 + len(sentence)) // 4)
+                    else:
+                        grown_token_count = current_token_count + separator_token_count + sentence_token_count
+                if current_parts and grown_token_count > self.max_chunk_size:
                     # Save current chunk
-                    sub_chunk = {
-                        'content': current_chunk_text,
-                        'heading': heading,
-                        'level': level,
-                        'path': path,
-                        'token_count': current_token_count,
-                        'start_pos': start_pos + current_start,
-                        'end_pos': start_pos + current_start + len(current_chunk_text)
-                    }
+                    current_chunk_text = " ".join(current_parts)
+                    sub_chunk = Chunk(
+                        content=current_chunk_text,
+                        heading=heading,
+                        level=level,
+                        path=path,
+                        token_count=current_token_count,
+                        start_pos=start_pos + current_start,
+                        end_pos=start_pos + current_start + current_char_count
+                    )
                     sub_chunks.append(sub_chunk)
                     
                     # Create overlap by including previous text up to overlap_size
-                    overlap_text = self._get_overlap_text(current_chunk_text)
-                    current_chunk_text = overlap_text
-                    current_token_count = self.estimate_tokens(overlap_text)
-                    current_start = current_start + len(current_chunk_text) - len(overlap_text)
+                    overlap_text = self._get_overlap_text(current_chunk_text, may_contain_formulas)
+                    current_parts = [overlap_text] if overlap_text else []
+                    current_char_count = len(overlap_text)
+                    current_token_count = self.tokenize_batch([overlap_text])[0] if overlap_text else 0
                 
                 # Add sentence to current chunk
-                if current_chunk_text:
-                    current_chunk_text += " " + sentence
+                if current_parts:
+                    current_char_count += 1 + len(sentence)
+                    current_token_count += separator_token_count + sentence_token_count
                 else:
-                    current_chunk_text = sentence
+                    current_char_count = len(sentence)
+                    current_token_count = sentence_token_count
                     current_start = last_boundary
-                current_token_count = self.estimate_tokens(current_chunk_text)
-            
-            last_boundary = boundary
+                current_parts.append(sentence)
+                if counts_by_characters:
+                    # Same as estimate_tokens on the joined text, without re-measuring it
+                    current_token_count = max(1, current_char_count // 4)
         
         # Add the last sub-chunk if there's content left
-        if current_chunk_text:
-            sub_chunk = {
-                'content': current_chunk_text,
-                'heading': heading,
-                'level': level,
-                'path': path,
-                'token_count': current_token_count,
-                'start_pos': start_pos + current_start,
-                'end_pos': start_pos + current_start + len(current_chunk_text)
-            }
+        if current_parts:
+            sub_chunk = Chunk(
+                content=" ".join(current_parts),
+                heading=heading,
+                level=level,
+                path=path,
+                token_count=current_token_count,
+                start_pos=start_pos + current_start,
+                end_pos=start_pos + current_start + current_char_count
+            )
             sub_chunks.append(sub_chunk)
         
         return sub_chunks
     
-    def _merge_small_chunks(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _merge_small_chunks(self, chunks: Iterable[Chunk]) -> Iterator[Chunk]:
         """Merge adjacent small chunks together up to min_chunk_size."""
-        if not chunks:
-            return []
-        
-        # Sort chunks by position
-        sorted_chunks = sorted(chunks, key=lambda x: x['start_pos'])
-        
-        merged_chunks = []
-        current_chunk = sorted_chunks[0].copy()
-        
-        for i in range(1, len(sorted_chunks)):
-            next_chunk = sorted_chunks[i]
-            
-            # If current chunk is below min size and same heading level, try to merge
-            if (current_chunk['token_count'] < self.min_chunk_size and 
-                current_chunk['level'] == next_chunk['level'] and
-                current_chunk['path'] == next_chunk['path']):
-                
-                # Check if merging wouldn't exceed max size
-                combined_tokens = current_chunk['token_count'] + next_chunk['token_count']
-                if combined_tokens <= self.max_chunk_size:
-                    # Merge the chunks
-                    current_chunk['content'] += "\n\n" + next_chunk['content']
-                    current_chunk['token_count'] = combined_tokens
-                    current_chunk['end_pos'] = next_chunk['end_pos']
+        # Chunks arrive in document order, so a single forward pass is enough.
+        # Merged text is collected in current_parts and joined once per group,
+        # and a chunk is only copied when something was actually merged into it
+        min_chunk_size = self.min_chunk_size
+        max_chunk_size = self.max_chunk_size
+        current_chunk = None
+        current_parts = []
+        current_token_count = 0
+        current_end_pos = 0
+        
+        def finish_group():
+            if len(current_parts) == 1:
+                return current_chunk
+            return replace(
+                current_chunk,
+                content="\n\n".join(current_parts),
+                token_count=current_token_count,
+                end_pos=current_end_pos
+            )
+        
+        for next_chunk in chunks:
+            if current_chunk is not None:
+                # If current chunk is below min size and same heading level, try to merge
+                # as long as merging wouldn't exceed max size
+                if (current_token_count < min_chunk_size and
+                    current_chunk.level == next_chunk.level and
+                    current_chunk.path == next_chunk.path and
+                    current_token_count + next_chunk.token_count <= max_chunk_size):
+                    current_parts.append(next_chunk.content)
+                    current_token_count += next_chunk.token_count
+                    current_end_pos = next_chunk.end_pos
                     continue
+                
+                # If we can't merge, emit the current group and start a new one
+                yield finish_group()
             
-            # If we can't merge, save current chunk and start a new one
-            merged_chunks.append(current_chunk)
-            current_chunk = next_chunk.copy()
+            current_chunk = next_chunk
+            current_parts = [next_chunk.content]
+            current_token_count = next_chunk.token_count
+            current_end_pos = next_chunk.end_pos
+        
+        # Emit the last group
+        if current_chunk is not None:
+            yield finish_group()
+    
+    def _get_overlap_text(self, text: str, may_contain_formulas: bool = True) -> str:
+        """
+        Get text for overlap from the end of a chunk.
         
-        # Add the last chunk
-        merged_chunks.append(current_chunk)
+        Args:
+            text: Text of the chunk that was just saved
+            may_contain_formulas: False when the caller already knows the text
+                has no formulas, which skips the formula scan
+        """
+        char_overlap = self.overlap_size * 4  # Rough estimate: 1 token ≈ 4 chars
         
-        return merged_chunks
-    
-    def _get_overlap_text(self, text: str) -> str:
-        """Get text for overlap from the end of a chunk."""
-        # Handle formula-specific overlap needs
-        formula_boundaries = self.extract_formula_boundaries(text)
+        # Handle formula-specific overlap needs. Only formulas ending in the
+        # overlap zone matter, so scan a bounded tail window rather than the
+        # whole chunk. Inline math never spans a newline, so starting the window
+        # at a line start keeps $ delimiters paired as in the full text
+        window_start = max(0, len(text) - char_overlap - _FORMULA_LOOKBACK)
+        if window_start > 0:
+            window_start = text.rfind('\n', 0, window_start) + 1
+        window = text[window_start:]
+        
+        # Plain prose has no formula markers; skip the regex scan entirely
+        if may_contain_formulas and ('$' in window or '\\begin' in window):
+            formula_boundaries = self.extract_formula_boundaries(window)
+        else:
+            formula_boundaries = []
         
         # If there's a formula near the end, include the whole formula
         if formula_boundaries:
             for start, end in reversed(formula_boundaries):
                 # If formula ends in the last part of the text
-                if end > len(text) - (self.overlap_size * 4):
+                if window_start + end > len(text) - char_overlap:
                     # Include from the start of the last formula to the end
-                    return text[start:]
+                    return text[window_start + start:]
         
         # Default: get last N tokens of text (approximated as characters)
-        char_overlap = self.overlap_size * 4  # Rough estimate: 1 token ≈ 4 chars
         if len(text) <= char_overlap:
             return text
         
         # Try to find paragraph or sentence boundary for cleaner overlap
         overlap_text = text[-char_overlap:]
-        para_match = re.search(r'\n\s*\n', overlap_text)
+        para_match = _PARA_RE.search(overlap_text)
         if para_match:
             # Start from paragraph boundary within overlap zone
             return overlap_text[para_match.end():]
         
-        sentence_match = re.search(r'(?<=[.!?])\s+', overlap_text)
+        sentence_match = _SENTENCE_RE.search(overlap_text)
         if sentence_match:
             # Start from sentence boundary within overlap zone
             return overlap_text[sentence_match.end():]
         
         return overlap_text
     
-    def process(self) -> List[Dict[str, Any]]:
+    def process(self) -> List[Chunk]:
         """Process the markdown file and create chunks."""
         # Create chunks
         self.chunks = self.create_semantic_chunks()
@@ -547,24 +740,47 @@ class MarkdownChunker:
         """Save chunks to the specified output format."""
         try:
             if self.output_format == 'jsonl':
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    for chunk in self.chunks:
-                        f.write(json.dumps(chunk) + '\n')
+                # Stream straight from the pipeline when process() has not been run
+                chunks = self.chunks if self.chunks else self.iter_chunks()
+                if orjson is not None:
+                    with open(output_file, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
+                        # orjson appends the newline itself, saving a concatenation per chunk
+                        f.writelines(
+                            orjson.dumps(chunk.to_dict(), option=orjson.OPT_APPEND_NEWLINE)
+                            for chunk in chunks
+                        )
+                else:
+                    with open(output_file, 'w', encoding='utf-8', buffering=_WRITE_BUFFER_SIZE) as f:
+                        f.writelines(json.dumps(chunk.to_dict(), ensure_ascii=False) + '\n' for chunk in chunks)
             
             elif self.output_format == 'json':
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.chunks, f, indent=2)
+                if orjson is not None:
+                    with open(output_file, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
+                        f.write(orjson.dumps([chunk.to_dict() for chunk in self.chunks], option=orjson.OPT_INDENT_2))
+                else:
+                    with open(output_file, 'w', encoding='utf-8', buffering=_WRITE_BUFFER_SIZE) as f:
+                        json.dump([chunk.to_dict() for chunk in self.chunks], f, indent=2)
             
             elif self.output_format == 'csv':
-                with open(output_file, 'w', encoding='utf-8', newline='') as f:
+                with open(output_file, 'w', encoding='utf-8', newline='', buffering=_WRITE_BUFFER_SIZE) as f:
                     # Create a minimal version for CSV (content and metadata)
                     fieldnames = ['id', 'heading', 'path', 'token_count', 'content']
-                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                    writer.writeheader()
-                    for chunk in self.chunks:
-                        writer.writerow({field: chunk.get(field, '') for field in fieldnames})
+                    writer = csv.writer(f)
+                    writer.writerow(fieldnames)
+                    writer.writerows(
+                        (chunk.id, chunk.heading, chunk.path, chunk.token_count, chunk.content)
+                        for chunk in self.chunks
+                    )
             
             return True
         except Exception as e:
             print(f"Error saving chunks: {e}")
-            return False
\ No newline at end of file
+            return False
+
+
+def _split_large_chunk_worker(
+    chunker_class: type, chunk: Chunk, max_chunk_size: int, overlap_size: int
+) -> List[Chunk]:
+    """Split a single oversized chunk; module level so worker processes can unpickle it."""
+    splitter = chunker_class("", max_chunk_size=max_chunk_size, overlap_size=overlap_size)
+    return splitter._split_large_chunk(chunk)
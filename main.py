@@ -1,8 +1,16 @@
 import os
+import argparse
+import hashlib
 from pdf2md.pdf_to_md import PdfToMarkdownConverter
 from chunking.chunker import chunk_markdown_file
 
-def run_project():
+def chunks_cache_key(md_path, max_chunk_size, overlap_size, min_chunk_size):
+    """Identify a chunking run by the markdown file's mtime and size and the chunking parameters."""
+    stat = os.stat(md_path)
+    key = f"{stat.st_mtime_ns}:{stat.st_size}:{max_chunk_size}:{overlap_size}:{min_chunk_size}"
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+def run_project(force=False):
     print("Physics Chatbot Project")
     print("-----------------------")
 
@@ -10,6 +18,7 @@ def run_project():
     pdf_path = "resources/book.pdf"
     md_path = "resources/book.md"
     chunks_path = "resources/chunks.jsonl"
+    chunks_key_path = chunks_path + ".key"  # Cache key of the run that wrote chunks_path
     
     # Step 1: PDF to Markdown conversion
     if os.path.exists(md_path):
@@ -24,16 +33,27 @@ def run_project():
             return
     
     # Step 2: Chunk the markdown file
-    if os.path.exists(chunks_path):
-        print("Chunks file already exists. Skipping chunking.")
+    # Set parameters for chunking
+    max_chunk_size = 1024  # ~1024 tokens max per chunk
+    overlap_size = 200     # ~200 tokens overlap
+    min_chunk_size = 100   # ~100 tokens minimum per chunk
+    output_format = "jsonl"  # JSONL format for chunks
+    
+    # Reuse the chunks only if they came from this markdown file and these parameters
+    cache_key = chunks_cache_key(md_path, max_chunk_size, overlap_size, min_chunk_size)
+    cached_key = None
+    if os.path.exists(chunks_path) and os.path.exists(chunks_key_path):
+        with open(chunks_key_path, 'r', encoding='utf-8') as f:
+            cached_key = f.read().strip()
+    
+    if not force and cached_key == cache_key:
+        print("Chunks file is up to date. Skipping chunking.")
     else:
         print("Chunking Markdown file...")
-        # Set parameters for chunking
-        max_chunk_size = 1024  # ~1024 tokens max per chunk
-        overlap_size = 200     # ~200 tokens overlap
-        min_chunk_size = 100   # ~100 tokens minimum per chunk
-        output_format = "jsonl"  # JSONL format for chunks
-        
+        # Drop the old key first so an interrupted or failed run can't leave a
+        # stale key vouching for a partially written chunks file
+        if os.path.exists(chunks_key_path):
+            os.remove(chunks_key_path)
         if chunk_markdown_file(
             input_file=md_path,
             output_file=chunks_path,
@@ -42,6 +62,8 @@ def run_project():
             min_chunk_size=min_chunk_size,
             output_format=output_format
         ):
+            with open(chunks_key_path, 'w', encoding='utf-8') as f:
+                f.write(cache_key)
             print("Markdown chunking completed successfully!")
         else:
             print("Markdown chunking failed!")
@@ -50,4 +72,7 @@ def run_project():
     print("Project completed!")
 
 if __name__ == "__main__":
-    run_project()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Physics Chatbot pipeline')
+    parser.add_argument('--force', action='store_true', help='Re-chunk even if the chunks file is up to date')
+    args = parser.parse_args()
+    run_project(force=args.force)
\ No newline at end of file
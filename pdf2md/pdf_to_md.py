@@ -1,81 +1,211 @@
 import pdfplumber
 import re
 import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
 from tqdm import tqdm
 
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # Optional: only needed for backend="pymupdf"
+    fitz = None
+
+# Compiled once instead of on every format_formula call
+_FORMULA_RE = re.compile(r'(\b\w+\^\d+|\bsqrt\(.+?\)|[\w\d]+/[\/\w\d]+)')
+_FORMULA_SEARCH = _FORMULA_RE.search
+# Output buffer, so pages reach disk in a few large writes
+_WRITE_BUFFER_SIZE = 1 << 20
+
+# Pages and extractor of the PDF opened once per worker process by _init_page_worker
+_worker_pages = None
+_worker_extract = None
+
+@lru_cache(maxsize=4096)
+def _is_heading(text, prev_empty):
+    """Heading test for a stripped line; cached because running headers repeat on every page."""
+    if not text or len(text) > 100:
+        return False
+    if text.isupper():
+        return True
+    return len(text) < 50 and prev_empty
+
+def _cell_str(cell):
+    """Render a table cell for markdown; empty and missing cells become ''."""
+    return str(cell) if cell else ""
+
+def _extract_page_content(page):
+    """Extract the raw text and tables of a single pdfplumber page."""
+    text = page.extract_text() or ""
+    # pdfplumber's default table settings build tables from ruling lines, so a
+    # page without any edges cannot contain one; skip the table finder there
+    tables = (page.extract_tables() or []) if page.edges else []
+    # Both calls above share the page's cached layout; drop it now, since
+    # pdf.pages would otherwise keep every parsed page alive until the end
+    page.close()
+    return text, tables
+
+def _extract_pymupdf_page_content(page):
+    """Extract the raw text and tables of a single PyMuPDF page."""
+    text = page.get_text("text") or ""
+    tables = [table.extract() for table in page.find_tables().tables]
+    return text, tables
+
+# Page extractor for each supported backend
+_PAGE_EXTRACTORS = {
+    "pdfplumber": _extract_page_content,
+    "pymupdf": _extract_pymupdf_page_content,
+}
+
+def _open_pdf(pdf_path, backend):
+    """Open pdf_path with the given backend; returns (document, sequence of pages)."""
+    if backend == "pymupdf":
+        if fitz is None:
+            raise ImportError("PyMuPDF is not installed; install it or use the pdfplumber backend")
+        # A PyMuPDF document is itself the sequence of its pages
+        document = fitz.open(pdf_path)
+        return document, document
+    if backend != "pdfplumber":
+        raise ValueError(f"Unknown PDF backend '{backend}'")
+    document = pdfplumber.open(pdf_path)
+    return document, document.pages
+
+def _init_page_worker(pdf_path, backend):
+    """Open the PDF once per worker instead of once per page."""
+    global _worker_pages, _worker_extract
+    _, _worker_pages = _open_pdf(pdf_path, backend)
+    _worker_extract = _PAGE_EXTRACTORS[backend]
+
+def _extract_worker_page(page_index):
+    """Extract one page in a worker process; module level so it can be pickled."""
+    return _worker_extract(_worker_pages[page_index])
+
 class PdfToMarkdownConverter:
-    def __init__(self, pdf_path, output_md_path):
+    def __init__(self, pdf_path, output_md_path, workers=1, backend="pdfplumber"):
         self.pdf_path = pdf_path
         self.output_md_path = output_md_path
+        # Processes used to extract pages; 1 extracts everything in this process
+        self.workers = workers
+        # "pdfplumber", or "pymupdf" for much faster parsing when PyMuPDF is installed
+        self.backend = backend
 
     def is_heading(self, text, prev_text=""):
-        text = text.strip()
-        if not text or len(text) > 100:
-            return False
-        if text.isupper() or (prev_text.strip() == "" and len(text) < 50):
-            return True
-        return False
+        # Only whether the previous line is blank matters, so the cache is keyed
+        # on that (same as prev_text.strip() == "" without copying the line)
+        return _is_heading(text.strip(), not prev_text or prev_text.isspace())
 
     def format_formula(self, text):
-        formula_pattern = r'(\b\w+\^\d+|\bsqrt\(.+?\)|[\w\d]+/[\/\w\d]+)'
-        if re.search(formula_pattern, text):
-            return f"${text}$"
-        return text
+        # Every alternative in the pattern needs a '^', a '/' or 'sqrt(', and
+        # most lines have none of them, so skip the regex for those
+        if '^' not in text and '/' not in text and 'sqrt(' not in text:
+            return text
+        return f"${text}$" if _FORMULA_SEARCH(text) else text
+
+    def format_lines(self, lines, prev_text=""):
+        """
+        Format the text lines of one page as markdown fragments.
+
+        Returns the fragments and the last non-empty line, which heading
+        detection on the following page looks back at.
+        """
+        # This runs for every line of the book; bind the lookups once
+        parts = []
+        append = parts.append
+        is_heading = self.is_heading
+        format_formula = self.format_formula
+        for line in lines:
+            line = line.strip()
+            if not line:
+                append("\n")
+                continue
+            if is_heading(line, prev_text):
+                append(f"### {line}\n\n")
+            else:
+                append(f"{format_formula(line)}  \n")
+            prev_text = line
+        return parts, prev_text
 
     def convert(self):
+        output_started = False
         try:
             if not os.path.exists(self.pdf_path):
                 raise FileNotFoundError(f"PDF file '{self.pdf_path}' not found!")
 
-            markdown_content = "# Converted PDF Book\n\n"
-            with pdfplumber.open(self.pdf_path) as pdf:
-                total_pages = len(pdf.pages)
+            # Each page is written as soon as it is formatted, so only one page
+            # of markdown is held in memory at a time
+            document, pages = _open_pdf(self.pdf_path, self.backend)
+            with document, \
+                    open(self.output_md_path, 'wb', buffering=_WRITE_BUFFER_SIZE) as md_file:
+                output_started = True
+                md_file.write(b"# Converted PDF Book\n\n")
+                total_pages = len(pages)
                 prev_text = ""
 
-                with tqdm(total=total_pages, desc="Converting PDF to Markdown", unit="page") as pbar:
-                    for page_num, page in enumerate(pdf.pages, 1):
-                        text = page.extract_text() or ""
-                        lines = text.split("\n")
-                        tables = page.extract_tables() or []
-                        table_content = ""
-
-                        page_text = f"## Page {page_num}\n\n"
-                        for line in lines:
-                            line = line.strip()
-                            if not line:
-                                page_text += "\n"
-                                continue
-                            if self.is_heading(line, prev_text):
-                                page_text += f"### {line}\n\n"
-                            else:
-                                formatted_line = self.format_formula(line)
-                                page_text += f"{formatted_line}  \n"
-                            prev_text = line
+                # Page extraction in pdfminer dominates the run time, so it can be
+                # spread over worker processes. Pages are still formatted here, in
+                # order, because heading detection carries over between pages
+                parallel = self.workers > 1 and total_pages > 1
+                executor_context = (
+                    ProcessPoolExecutor(
+                        max_workers=min(self.workers, total_pages),
+                        initializer=_init_page_worker,
+                        initargs=(self.pdf_path, self.backend)
+                    )
+                    if parallel else nullcontext()
+                )
+
+                # Redraw the bar at most every half second / 1% of the pages, and
+                # not at all for short documents
+                progress = tqdm(
+                    total=total_pages,
+                    desc="Converting PDF to Markdown",
+                    unit="page",
+                    mininterval=0.5,
+                    miniters=max(1, total_pages // 100),
+                    disable=total_pages < 20
+                )
+
+                with executor_context as executor, progress as pbar:
+                    if parallel:
+                        page_contents = executor.map(_extract_worker_page, range(total_pages), chunksize=4)
+                    else:
+                        page_contents = map(_PAGE_EXTRACTORS[self.backend], pages)
+
+                    for page_num, (text, tables) in enumerate(page_contents, 1):
+                        page_parts = [f"## Page {page_num}\n\n"]
+                        line_parts, prev_text = self.format_lines(text.split("\n"), prev_text)
+                        page_parts += line_parts
 
                         if tables:
-                            table_content += "### Tables\n\n"
+                            page_parts.append("### Tables\n\n")
                             for table in tables:
                                 if not table or not table[0]:
                                     continue
-                                header = [str(cell or "") for cell in table[0]]
-                                table_md = "| " + " | ".join(header) + " |\n"
-                                table_md += "| " + " | ".join(["---"] * len(header)) + " |\n"
+                                page_parts.append("| " + " | ".join(map(_cell_str, table[0])) + " |\n")
+                                page_parts.append("|" + " --- |" * len(table[0]) + "\n")
                                 for row in table[1:]:
-                                    row = [str(cell or "") for cell in row]
-                                    table_md += "| " + " | ".join(row) + " |\n"
-                                table_content += table_md + "\n\n"
+                                    page_parts.append("| " + " | ".join(map(_cell_str, row)) + " |\n")
+                                page_parts.append("\n\n")
 
-                        markdown_content += page_text + table_content
+                        # Encode the whole page at once into the binary buffer
+                        md_file.write("".join(page_parts).encode('utf-8'))
                         pbar.update(1)  
 
-            with open(self.output_md_path, 'w', encoding='utf-8') as md_file:
-                md_file.write(markdown_content)
             print(f"\nConversion complete! Markdown file saved as: {self.output_md_path}")
             return True
         except Exception as e:
             print(f"\nAn error occurred: {str(e)}")
+            # Don't leave a truncated book behind for later steps to pick up
+            if output_started and os.path.exists(self.output_md_path):
+                os.remove(self.output_md_path)
             return False
 
 if __name__ == "__main__":
-    converter = PdfToMarkdownConverter("book.pdf", "book.md")
+    parser = argparse.ArgumentParser(description='Convert a PDF book to Markdown')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes used to extract pages')
+    parser.add_argument('--backend', choices=sorted(_PAGE_EXTRACTORS), default='pdfplumber',
+                        help='Library used to parse the PDF')
+    args = parser.parse_args()
+    converter = PdfToMarkdownConverter("book.pdf", "book.md", workers=args.workers, backend=args.backend)
     converter.convert()
\ No newline at end of file
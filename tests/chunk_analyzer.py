@@ -1,13 +1,42 @@
 # tests/chunk_analyzer.py
 import json
 import os
+import mmap
 import sys
-import statistics
-import matplotlib.pyplot as plt
+import numpy as np
 from collections import Counter
 import argparse
 from typing import Dict, List, Any
 
+try:
+    import orjson
+except ImportError:  # Optional: fall back to the standard json module
+    orjson = None
+
+# Both parsers accept the raw bytes of a line
+_loads = orjson.loads if orjson is not None else json.loads
+
+def _iter_lines(path: str):
+    """Yield the raw byte lines of a file, read through a read-only memory map."""
+    with open(path, 'rb') as f:
+        # mmap refuses empty files, which have no lines anyway
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield from iter(mapped.readline, b'')
+
+def _describe(values: np.ndarray) -> Dict[str, Any]:
+    """Summary statistics of a 1-D array as plain Python numbers (JSON friendly)."""
+    if not values.size:
+        return {'min': 0, 'max': 0, 'avg': 0, 'median': 0, 'stdev': 0}
+    return {
+        'min': int(values.min()),
+        'max': int(values.max()),
+        'avg': float(values.mean()),
+        'median': float(np.median(values)),
+        'stdev': float(values.std(ddof=1)) if values.size > 1 else 0
+    }
+
 class ChunkAnalyzer:
     def __init__(self, chunks_file: str):
         """
@@ -17,14 +46,33 @@ class ChunkAnalyzer:
             chunks_file: Path to the JSONL file containing chunks
         """
         self.chunks_file = chunks_file
-        self.chunks = []
+        # Only what the analysis uses is kept: per-chunk sizes, plus tallies of
+        # heading levels and chunk types
+        self._token_counts = []
+        self._content_lengths = []
+        self._level_counter = Counter()
+        self._type_counter = Counter()
         self.stats = {}
         
     def load_chunks(self) -> bool:
-        """Load chunks from the JSONL file."""
+        """Load the analysed fields of every chunk from the JSONL file."""
         try:
-            with open(self.chunks_file, 'r', encoding='utf-8') as f:
-                self.chunks = [json.loads(line) for line in f]
+            token_counts = []
+            content_lengths = []
+            level_counter = Counter()
+            type_counter = Counter()
+            # One pass collects every metric; levels and types are counted
+            # directly instead of being listed and counted afterwards
+            for line in _iter_lines(self.chunks_file):
+                chunk = _loads(line)
+                token_counts.append(chunk.get('token_count', 0))
+                content_lengths.append(len(chunk.get('content', '')))
+                level_counter[chunk.get('level', 0)] += 1
+                type_counter[chunk.get('chunk_type', 'main_chunk')] += 1
+            self._token_counts = token_counts
+            self._content_lengths = content_lengths
+            self._level_counter = level_counter
+            self._type_counter = type_counter
             return True
         except Exception as e:
             print(f"Error loading chunks file: {e}")
@@ -32,49 +80,29 @@ class ChunkAnalyzer:
     
     def analyze(self) -> Dict[str, Any]:
         """Analyze the chunks and generate statistics."""
-        if not self.chunks and not self.load_chunks():
+        if not self._token_counts and not self.load_chunks():
             return {}
         
         # Count chunks
-        total_chunks = len(self.chunks)
+        total_chunks = len(self._token_counts)
         
         # Analyze token counts
-        token_counts = [chunk.get('token_count', 0) for chunk in self.chunks]
+        token_counts = np.array(self._token_counts, dtype=np.int64)
         
         # Analyze content length
-        content_lengths = [len(chunk.get('content', '')) for chunk in self.chunks]
-        
-        # Analyze heading levels
-        heading_levels = [chunk.get('level', 0) for chunk in self.chunks]
-        level_counter = Counter(heading_levels)
-        
-        # Analyze chunk types
-        chunk_types = [chunk.get('chunk_type', 'main_chunk') for chunk in self.chunks]
-        type_counter = Counter(chunk_types)
+        content_lengths = np.array(self._content_lengths, dtype=np.int64)
         
         # Count total tokens
-        total_tokens = sum(token_counts)
+        total_tokens = int(token_counts.sum())
         
         # Calculate statistics
         stats = {
             'total_chunks': total_chunks,
             'total_tokens': total_tokens,
-            'token_count': {
-                'min': min(token_counts) if token_counts else 0,
-                'max': max(token_counts) if token_counts else 0,
-                'avg': statistics.mean(token_counts) if token_counts else 0,
-                'median': statistics.median(token_counts) if token_counts else 0,
-                'stdev': statistics.stdev(token_counts) if len(token_counts) > 1 else 0
-            },
-            'content_length': {
-                'min': min(content_lengths) if content_lengths else 0,
-                'max': max(content_lengths) if content_lengths else 0,
-                'avg': statistics.mean(content_lengths) if content_lengths else 0,
-                'median': statistics.median(content_lengths) if content_lengths else 0,
-                'stdev': statistics.stdev(content_lengths) if len(content_lengths) > 1 else 0
-            },
-            'heading_levels': dict(level_counter),
-            'chunk_types': dict(type_counter)
+            'token_count': _describe(token_counts),
+            'content_length': _describe(content_lengths),
+            'heading_levels': dict(self._level_counter),
+            'chunk_types': dict(self._type_counter)
         }
         
         self.stats = stats
@@ -110,12 +138,16 @@ class ChunkAnalyzer:
         report.append(f"- Standard Deviation: {self.stats['content_length']['stdev']:.2f}")
         
         report.append("\n## Heading Level Distribution")
-        for level, count in sorted(self.stats['heading_levels'].items()):
+        level_counter = self._level_counter
+        for level in sorted(level_counter):
+            count = level_counter[level]
             level_name = "Document Start" if level == 0 else f"Level {level}"
             report.append(f"- {level_name}: {count} chunks ({count/self.stats['total_chunks']*100:.1f}%)")
         
         report.append("\n## Chunk Type Distribution")
-        for chunk_type, count in sorted(self.stats['chunk_types'].items()):
+        type_counter = self._type_counter
+        for chunk_type in sorted(type_counter):
+            count = type_counter[chunk_type]
             report.append(f"- {chunk_type}: {count} chunks ({count/self.stats['total_chunks']*100:.1f}%)")
         
         report.append("\n## Recommendations")
@@ -132,7 +164,7 @@ class ChunkAnalyzer:
         if std_dev > avg_tokens * 0.5:
             report.append("- High variation in chunk sizes - may need to refine chunking strategy")
             
-        sub_chunk_count = self.stats['chunk_types'].get('sub_chunk', 0)
+        sub_chunk_count = type_counter['sub_chunk']
         if sub_chunk_count / self.stats['total_chunks'] > 0.5:
             report.append("- Many large sections were split into sub-chunks, consider restructuring document")
         
@@ -147,57 +179,63 @@ class ChunkAnalyzer:
             return False
         
         try:
+            # Imported here so reports and JSON exports don't pay matplotlib's
+            # start-up cost; Agg renders straight to files without a GUI
+            import matplotlib
+            matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
+            
             os.makedirs(output_dir, exist_ok=True)
             
+            # One figure and axes are reused for every plot, cleared in between
+            fig, ax = plt.subplots(figsize=(10, 6))
+            
             # Plot 1: Token Count Distribution
-            plt.figure(figsize=(10, 6))
-            token_counts = [chunk.get('token_count', 0) for chunk in self.chunks]
-            plt.hist(token_counts, bins=20, color='skyblue', edgecolor='black')
-            plt.title('Distribution of Token Counts')
-            plt.xlabel('Token Count')
-            plt.ylabel('Number of Chunks')
-            plt.axvline(self.stats['token_count']['avg'], color='red', linestyle='--', 
+            ax.hist(self._token_counts, bins=20, color='skyblue', edgecolor='black')
+            ax.set_title('Distribution of Token Counts')
+            ax.set_xlabel('Token Count')
+            ax.set_ylabel('Number of Chunks')
+            ax.axvline(self.stats['token_count']['avg'], color='red', linestyle='--', 
                        label=f"Average: {self.stats['token_count']['avg']:.1f}")
-            plt.axvline(self.stats['token_count']['median'], color='green', linestyle='--', 
+            ax.axvline(self.stats['token_count']['median'], color='green', linestyle='--', 
                        label=f"Median: {self.stats['token_count']['median']}")
-            plt.legend()
-            plt.tight_layout()
-            plt.savefig(os.path.join(output_dir, 'token_distribution.png'))
-            plt.close()
+            ax.legend()
+            fig.tight_layout()
+            fig.savefig(os.path.join(output_dir, 'token_distribution.png'))
             
             # Plot 2: Heading Level Distribution
-            plt.figure(figsize=(10, 6))
+            ax.clear()
             levels = []
             counts = []
-            for level, count in sorted(self.stats['heading_levels'].items()):
+            for level in sorted(self._level_counter):
                 level_name = "Doc Start" if level == 0 else f"Level {level}"
                 levels.append(level_name)
-                counts.append(count)
+                counts.append(self._level_counter[level])
             
-            plt.bar(levels, counts, color='lightgreen', edgecolor='black')
-            plt.title('Distribution of Heading Levels')
-            plt.xlabel('Heading Level')
-            plt.ylabel('Number of Chunks')
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-            plt.savefig(os.path.join(output_dir, 'heading_distribution.png'))
-            plt.close()
+            ax.bar(levels, counts, color='lightgreen', edgecolor='black')
+            ax.set_title('Distribution of Heading Levels')
+            ax.set_xlabel('Heading Level')
+            ax.set_ylabel('Number of Chunks')
+            ax.tick_params(axis='x', labelrotation=45)
+            fig.tight_layout()
+            fig.savefig(os.path.join(output_dir, 'heading_distribution.png'))
             
             # Plot 3: Chunk Types
-            plt.figure(figsize=(10, 6))
+            ax.clear()
             types = []
             type_counts = []
-            for chunk_type, count in sorted(self.stats['chunk_types'].items()):
+            for chunk_type in sorted(self._type_counter):
                 types.append(chunk_type)
-                type_counts.append(count)
+                type_counts.append(self._type_counter[chunk_type])
             
-            plt.bar(types, type_counts, color='salmon', edgecolor='black')
-            plt.title('Distribution of Chunk Types')
-            plt.xlabel('Chunk Type')
-            plt.ylabel('Number of Chunks')
-            plt.tight_layout()
-            plt.savefig(os.path.join(output_dir, 'chunk_types.png'))
-            plt.close()
+            ax.bar(types, type_counts, color='salmon', edgecolor='black')
+            ax.set_title('Distribution of Chunk Types')
+            ax.set_xlabel('Chunk Type')
+            ax.set_ylabel('Number of Chunks')
+            ax.tick_params(axis='x', labelrotation=0)
+            fig.tight_layout()
+            fig.savefig(os.path.join(output_dir, 'chunk_types.png'))
+            plt.close(fig)
             
             return True
         except Exception as e:
@@ -220,8 +258,13 @@ class ChunkAnalyzer:
             self.analyze()
             
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(self.stats, f, indent=2)
+            if orjson is not None:
+                # Heading levels are int keys; json.dump turns them into strings too
+                with open(output_file, 'wb') as f:
+                    f.write(orjson.dumps(self.stats, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+            else:
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.stats, f, indent=2)
             return True
         except Exception as e:
             print(f"Error exporting stats: {e}")
@@ -0,0 +1,44 @@
+"""
+Synthetic markdown corpora for chunker tests and output comparisons.
+
+Documents are built from a fixed seed, so the same arguments always produce
+the same file. The defaults give a multi-megabyte book-sized document; tests
+pass smaller settings.
+"""
+import random
+
+WORDS = "force mass energy velocity momentum field charge wave particle quantum. the of and is! to in? a".split()
+PARAGRAPH_LENGTHS = [5, 40, 200, 800, 3000, 6000]
+
+def synthesize_corpus(path, seed, sections=60, max_paragraphs=30, paragraph_lengths=PARAGRAPH_LENGTHS):
+    """
+    Write a deterministic markdown document mixing prose, inline and display
+    math, and LaTeX environments.
+
+    Args:
+        path: Output markdown file
+        seed: Random seed; the same seed always produces the same document
+        sections: Number of headings
+        max_paragraphs: Maximum number of paragraphs per section
+        paragraph_lengths: Paragraph lengths in words to choose from
+    """
+    rnd = random.Random(seed)
+    out = []
+    for h in range(sections):
+        out.append("#" * rnd.randint(1, 4) + " Heading %d" % h)
+        out.append("")
+        for p in range(rnd.randint(0, max_paragraphs)):
+            n = rnd.choice(paragraph_lengths)
+            para = " ".join(rnd.choice(WORDS) for _ in range(n))
+            r = rnd.random()
+            if r < 0.2:
+                para += " $E = mc^2$ and more text."
+            elif r < 0.3:
+                # Display math spanning a blank line, followed by the paragraph
+                para = "$$\n" + para[:500] + "\n\n" + para[500:900] + "\n$$\n" + para
+            elif r < 0.35:
+                para = "\\begin{align}\n x &= y \\\\\n\n z &= w\n\\end{align}\n" + para
+            out.append(para)
+            out.append("")
+    with open(path, 'w') as f:
+        f.write("Preamble text before any heading.\n\n" + "\n".join(out))
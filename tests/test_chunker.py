@@ -0,0 +1,130 @@
+import unittest
+import os
+import tempfile
+from chunking.markdown_chunker import MarkdownChunker
+from tests.corpus import synthesize_corpus
+
+class WordCountChunker(MarkdownChunker):
+    """Chunker with a custom tokenizer; module level so worker processes can unpickle it."""
+    def estimate_tokens(self, text):
+        return max(1, len(text.split()))
+
+    def tokenize_batch(self, texts):
+        return [self.estimate_tokens(text) for text in texts]
+
+class TestMarkdownChunker(unittest.TestCase):
+    def setUp(self):
+        """Set up a temporary directory for markdown inputs."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        self.temp_dir.cleanup()
+
+    def write_markdown(self, content, name="input.md"):
+        """Write markdown content to a temporary file and return its path."""
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_oversized_paragraph_keeps_formula_intact(self):
+        """Test that sentence splits inside an oversized paragraph skip display formulas."""
+        formula = "$$a = b. c = d. e = f$$"
+        content = (
+            "# Heading\n\n"
+            "Short intro paragraph here.\n\n"
+            + "Some words go here. " * 8 + formula + " " + "More words follow. " * 8 + "\n"
+        )
+        chunker = MarkdownChunker(self.write_markdown(content), max_chunk_size=30,
+                                  overlap_size=2, min_chunk_size=0)
+        chunks = chunker.create_semantic_chunks()
+
+        for chunk in chunks:
+            if "$$" in chunk.content:
+                self.assertIn(formula, chunk.content, "Formula should not be split across chunks")
+        self.assertTrue(any(formula in chunk.content for chunk in chunks), "Formula should be kept")
+
+    def test_overlap_keeps_inline_formula_pairing(self):
+        """Test that the bounded overlap scan pairs inline $ delimiters like a full scan."""
+        chunker = MarkdownChunker(self.write_markdown(""), overlap_size=10)
+        # One long line whose first inline formula straddles the start of the
+        # scan window; starting the scan mid-line would pair the wrong $ signs
+        text = "$x " + "word " * 500 + "y$ word word more text $a+b=c$ word "
+        self.assertEqual(chunker._get_overlap_text(text), "$a+b=c$ word ")
+
+    def test_parallel_split_uses_subclass_tokenizer(self):
+        """Test that worker processes split with the subclass's tokenizer."""
+        sections = []
+        for i in range(6):
+            paragraphs = ["Paragraph %d of section %d has a few words in it." % (j, i) for j in range(12)]
+            sections.append("# Section %d\n\n%s\n" % (i, "\n\n".join(paragraphs)))
+        path = self.write_markdown("\n".join(sections))
+
+        serial = WordCountChunker(path, max_chunk_size=40, overlap_size=5, min_chunk_size=0)
+        parallel = WordCountChunker(path, max_chunk_size=40, overlap_size=5, min_chunk_size=0, workers=2)
+
+        self.assertEqual(serial.create_semantic_chunks(), parallel.create_semantic_chunks())
+
+    def test_split_respects_subclass_tokenizer(self):
+        """Test that running sub-chunk sizes come from the subclass's tokenizer."""
+        # One-letter words: far more tokens than a character-based estimate expects
+        paragraphs = ["a b c d e f g h i j" for _ in range(20)]
+        path = self.write_markdown("# Section\n\n%s\n" % "\n\n".join(paragraphs))
+        chunker = WordCountChunker(path, max_chunk_size=40, overlap_size=5, min_chunk_size=0)
+
+        chunks = chunker.create_semantic_chunks()
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(chunk.token_count, 40)
+            self.assertLessEqual(chunker.estimate_tokens(chunk.content), 40)
+
+    def test_split_token_counts_match_default_estimate(self):
+        """Test that split chunks report, and stay within, the default estimate of their content."""
+        paragraphs = "\n\n".join("abcdefg %d" % i for i in range(1000))
+        sentences = " ".join("Short %d." % i for i in range(1000))
+        path = self.write_markdown("# Paragraphs\n\n%s\n\n# Sentences\n\n%s\n" % (paragraphs, sentences))
+        chunker = MarkdownChunker(path, max_chunk_size=100, overlap_size=10, min_chunk_size=0)
+
+        chunks = chunker.create_semantic_chunks()
+        self.assertGreater(len(chunks), 20)
+        for chunk in chunks:
+            self.assertEqual(chunk.token_count, chunker.estimate_tokens(chunk.content))
+            self.assertLessEqual(chunk.token_count, 100)
+
+    def test_unclosed_display_math_does_not_swallow_later_formulas(self):
+        """Test that an unclosed $$ leaves the formulas after it intact."""
+        chunker = MarkdownChunker(self.write_markdown(""))
+        text = "$$ open\n\nText with $x$ here.\n\nMore $$ y = z $$ end"
+        formulas = [text[start:end] for start, end in chunker.extract_formula_boundaries(text)]
+        self.assertEqual(formulas, ["$x$", "$$ y = z $$"])
+
+    def test_deduplicate_drops_repeated_chunks(self):
+        """Test that repeated chunk content is kept only when deduplication is off."""
+        # Chunk content includes the heading line, so the whole section repeats
+        boilerplate = "# Exercises\n\nThis page intentionally left blank."
+        path = self.write_markdown(
+            "# Chapter 1\n\nFirst chapter text.\n\n%s\n\n# Chapter 2\n\nSecond chapter text.\n\n%s\n\n"
+            "# Index\n\nAtoms, energy, waves.\n" % (boilerplate, boilerplate)
+        )
+
+        deduplicated = MarkdownChunker(path, min_chunk_size=0).create_semantic_chunks()
+        kept = MarkdownChunker(path, min_chunk_size=0, deduplicate=False).create_semantic_chunks()
+
+        self.assertEqual([c.content.strip() for c in kept].count(boilerplate), 2)
+        self.assertEqual([c.content.strip() for c in deduplicated].count(boilerplate), 1)
+        self.assertEqual(len(kept), len(deduplicated) + 1)
+        self.assertEqual(len({c.id for c in deduplicated}), len(deduplicated))
+
+    def test_parallel_matches_serial_on_corpus(self):
+        """Test that splitting in worker processes produces the serial output."""
+        path = os.path.join(self.temp_dir.name, "corpus.md")
+        synthesize_corpus(path, seed=3, sections=12, max_paragraphs=8, paragraph_lengths=[5, 40, 200, 800])
+
+        for max_chunk_size, overlap_size, min_chunk_size in [(256, 50, 100), (128, 100, 10)]:
+            serial = MarkdownChunker(path, max_chunk_size, overlap_size, min_chunk_size)
+            parallel = MarkdownChunker(path, max_chunk_size, overlap_size, min_chunk_size, workers=2)
+            self.assertEqual(serial.create_semantic_chunks(), parallel.create_semantic_chunks())
+
+if __name__ == "__main__":
+    unittest.main()